@@ -1,9 +1,17 @@
 import logging
 import asyncio
+import atexit
 import time
-import json
+import queue
+import orjson
 import uvicorn
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pathlib import Path
+from typing import Final, Optional
+from weakref import WeakSet
 from RealtimeSTT import AudioToTextRecorder
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
@@ -21,20 +29,32 @@ logger.setLevel(log_level)
 console_handler = logging.StreamHandler()
 console_handler.setFormatter(logging.Formatter(console_log_format, console_log_datefmt))
 console_handler.setLevel(log_level)
-logger.addHandler(console_handler)
 
 # File Log Handler
 log_file_path = Path(__file__).parent / "server.log"
-file_handler = logging.FileHandler(log_file_path)
+# Opened lazily on the first record and rotated instead of growing unbounded
+file_handler = RotatingFileHandler(
+    log_file_path, maxBytes=10_000_000, backupCount=3, delay=True
+)
 file_handler.setFormatter(logging.Formatter(file_log_format))
 file_handler.setLevel(log_level)
-logger.addHandler(file_handler)
+
+# Records are queued in memory and written by a background thread,
+# keeping console/disk I/O off the event loop
+log_queue = queue.SimpleQueue()
+logger.addHandler(QueueHandler(log_queue))
+log_listener = QueueListener(
+    log_queue, console_handler, file_handler, respect_handler_level=True
+)
+log_listener.start()
+# Stopped at interpreter exit so late records from the init thread and
+# recorder callbacks are still flushed
+atexit.register(log_listener.stop)
 
 # --- LOAD CONFIGURATION ---
 config_path = Path(__file__).parent / "config_.json"
 try:
-    with open(config_path, "r") as f:
-        config = json.load(f)
+    config = orjson.loads(config_path.read_bytes())
 except FileNotFoundError:
     logger.error(f"Configuration file not found at {config_path}. Using defaults.")
     config = {"MODEL": "base.en", "LANGUAGE": "en"}
@@ -42,38 +62,108 @@ except Exception as e:
     logger.error(f"Error loading config: {e}. Using defaults.")
     config = {"MODEL": "base.en", "LANGUAGE": "en"}
 
-MODEL = config.get("MODEL", "base.en")
-LANGUAGE = config.get("LANGUAGE", "en")
+MODEL: Final = config.get("MODEL", "base.en")
+LANGUAGE: Final = config.get("LANGUAGE", "en")
 
-# --- FASTAPI APP ---
-app = FastAPI(debug=False)
-recorder = None
-is_initializing = False
 
-origins = [
+# --- ENGINE STATE ---
+@dataclass(slots=True)
+class EngineState:
+    recorder: Optional[AudioToTextRecorder] = None
+    is_initializing: bool = False
+    # Serializes start/stop so concurrent requests can't create two recorders
+    init_lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    # Set on every recorder transition to wake the status producer
+    state_change: asyncio.Event = field(default_factory=asyncio.Event)
+    loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+state = EngineState()
+
+# Dedicated worker for the blocking recorder.text() calls
+stt_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stt")
+
+# Open sockets; weak refs so a missed discard can't keep a dead socket alive
+transcription_clients = WeakSet()
+# Status sockets are fed by a single background producer
+status_clients = WeakSet()
+status_payload = None
+# Fallback re-check in case a transition is ever missed
+STATUS_HEARTBEAT = 5
+
+# Exact origins only (no regex), so CORSMiddleware uses plain string matching.
+# It already forwards websocket scopes untouched, so it stays registered globally
+origins = (
     "http://localhost:8000",
     "http://localhost:5173",
     "http://127.0.0.1:5173",
-]
-
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
 )
 
 
+def _dumps(obj: dict) -> str:
+    # The frontend JSON.parse()s event.data, so keep sending text frames
+    return orjson.dumps(obj).decode()
+
+
 def data_formater(message_, type_):
     return {"message": message_, "type": type_, "time": time.time()}
 
 
+def build_status(rec, initializing: bool) -> dict:
+    return {
+        "is_recording": rec.is_recording if rec else False,
+        "is_running": rec.is_running if rec else False,
+        "is_shut_down": rec is None and not initializing,
+        "is_initializing": initializing,
+    }
+
+
+def build_status_payload(status: dict, now: float) -> str:
+    return _dumps({"status": status, "type": "status", "time": now})
+
+
+def build_transcription_payload(text: str, now: float) -> str:
+    return _dumps({"text": text, "type": "transcription", "time": now})
+
+
+async def broadcast_status(payload):
+    clients = list(status_clients)
+    results = await asyncio.gather(
+        *(ws.send_text(payload) for ws in clients), return_exceptions=True
+    )
+    for ws, result in zip(clients, results):
+        if isinstance(result, Exception):
+            status_clients.discard(ws)
+
+
+async def status_producer():
+    global status_payload
+    last_status = None
+    while True:
+        status = build_status(state.recorder, state.is_initializing)
+        # Serialize once per change and fan out to every connected client
+        if status != last_status:
+            status_payload = build_status_payload(status, time.time())
+            last_status = status
+            await broadcast_status(status_payload)
+        try:
+            await asyncio.wait_for(state.state_change.wait(), timeout=STATUS_HEARTBEAT)
+        except asyncio.TimeoutError:
+            pass
+        state.state_change.clear()
+
+
+def notify_state_change():
+    # Called from the recorder and executor threads as well as the loop
+    if state.loop is not None:
+        state.loop.call_soon_threadsafe(state.state_change.set)
+
+
 def initialize_recorder():
-    global recorder, is_initializing
-    is_initializing = True
+    state.is_initializing = True
+    notify_state_change()
     try:
-        recorder = AudioToTextRecorder(
+        state.recorder = AudioToTextRecorder(
             model=MODEL,
             language=LANGUAGE,
             no_log_file=True,
@@ -84,6 +174,8 @@ def initialize_recorder():
             post_speech_silence_duration=0.8,
             min_length_of_recording=1.0,
             silero_use_onnx=True,
+            on_recording_start=notify_state_change,
+            on_recording_stop=notify_state_change,
         )
         logger.info("RealTimeSTT Engine initialized successfully")
         return True
@@ -91,15 +183,56 @@ def initialize_recorder():
         logger.error(f"Failed to initialize recorder: {e}")
         return False
     finally:
-        is_initializing = False
+        state.is_initializing = False
+        notify_state_change()
+
 
+async def initialize_in_background():
+    async with state.init_lock:
+        if state.recorder is None:
+            await asyncio.to_thread(initialize_recorder)
 
-@app.on_event("startup")
-async def startup():
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
     logger.info("Server starting... initializing STT Engine in background")
-    # Run initialization in the background so the API stays responsive
-    asyncio.create_task(asyncio.to_thread(initialize_recorder))
+    state.loop = asyncio.get_running_loop()
+    status_task = asyncio.create_task(status_producer())
+    # Run initialization in the background so the API stays responsive; a
+    # failed init is only logged and can be retried through /start
+    init_task = asyncio.create_task(initialize_in_background())
     logger.info("Background initialization task scheduled")
+    yield
+    status_task.cancel()
+    await asyncio.gather(
+        *(ws.close() for ws in [*transcription_clients, *status_clients]),
+        return_exceptions=True,
+    )
+    # A running recorder.text() can't be cancelled through the executor; shut
+    # the recorder down so the stt worker returns and the process can exit.
+    # Cancelling an in-flight init would leave its thread building a recorder
+    # nobody shuts down, so let it finish and tear that recorder down too
+    await init_task
+    async with state.init_lock:
+        rec = state.recorder
+        if rec is not None:
+            logger.info("Shutting down RealTimeSTT Engine")
+            await asyncio.to_thread(rec.shutdown)
+            state.recorder = None
+    stt_executor.shutdown(wait=False, cancel_futures=True)
+    logger.info("STT executor stopped")
+
+
+# --- FASTAPI APP ---
+app = FastAPI(debug=False, lifespan=lifespan)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=origins,
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
 
 
 @app.get("/")
@@ -108,55 +241,95 @@ def root():
 
 
 @app.get("/shutdown")
-def shutdown():
-    global recorder
-    if recorder is None:
-        return data_formater("Engine already stopped", "info")
-    logger.info("Shutting down RealTimeSTT Engine")
-    recorder.shutdown()
-    recorder = None
+async def shutdown():
+    async with state.init_lock:
+        rec = state.recorder
+        if rec is None:
+            return data_formater("Engine already stopped", "info")
+        logger.info("Shutting down RealTimeSTT Engine")
+        await asyncio.to_thread(rec.shutdown)
+        state.recorder = None
+        notify_state_change()
     logger.info("Engine stopped")
     return data_formater("Engine stopped", "info")
 
 
 @app.get("/start")
-def start():
-    global recorder
-    if recorder is not None:
-        return data_formater("Engine already running", "info")
-    logger.info("Initializing Engine...")
-    if initialize_recorder():
+async def start():
+    async with state.init_lock:
+        if state.recorder is not None:
+            return data_formater("Engine already running", "info")
+        logger.info("Initializing Engine...")
+        started = await asyncio.to_thread(initialize_recorder)
+    if started:
         return data_formater("Engine started", "info")
     else:
         return data_formater("Failed to start engine", "error")
 
 
+async def wait_for_disconnect(websocket: WebSocket):
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+
+
+async def stream_transcriptions(websocket: WebSocket):
+    last_text = ""
+    while True:
+        rec = state.recorder
+        if rec is None:
+            await websocket.send_text(
+                _dumps({"text": "Engine is offline", "type": "error", "time": time.time()})
+            )
+            break
+
+        # recorder.text() blocks until an utterance is transcribed; it only
+        # comes back empty when interrupted, so back off instead of spinning
+        job = stt_executor.submit(rec.text)
+        try:
+            text = await asyncio.wrap_future(job)
+        except asyncio.CancelledError:
+            # A queued job is dropped along with its future, but one already
+            # running on the stt worker has to be interrupted or it eats the
+            # next utterance; other clients' calls are left alone
+            if job.running():
+                rec.interrupt_stop_event.set()
+            raise
+        if not text:
+            await asyncio.sleep(0.1)
+            continue
+        stripped = text.strip()
+        if not stripped or stripped == last_text:
+            continue
+        await websocket.send_text(build_transcription_payload(stripped, time.time()))
+        last_text = stripped
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
     logger.info("Transcription WebSocket connected")
-    last_text = ""
+    transcription_clients.add(websocket)
+    # Watch for the disconnect alongside the stream so a client that leaves
+    # while recorder.text() is blocking is noticed right away
+    tasks = (
+        asyncio.create_task(stream_transcriptions(websocket)),
+        asyncio.create_task(wait_for_disconnect(websocket)),
+    )
     try:
-        while True:
-            if recorder is None:
-                await websocket.send_json(
-                    {"text": "Engine is offline", "type": "error", "time": time.time()}
-                )
-                break
-
-            text = await asyncio.to_thread(recorder.text)
-            if text:
-                text = text.strip()
-                if text and text != last_text:
-                    await websocket.send_json(
-                        {"text": text, "type": "transcription", "time": time.time()}
-                    )
-                    last_text = text
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
     except WebSocketDisconnect:
         logger.info("Transcription WebSocket disconnected")
     except Exception as e:
         logger.error(f"Transcription error: {e}")
     finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        transcription_clients.discard(websocket)
         logger.info("Cleaning up Transcription WebSocket")
 
 
@@ -165,22 +338,27 @@ async def status_websocket(websocket: WebSocket):
     await websocket.accept()
     logger.info("Status WebSocket connected")
     try:
-        while True:
-            status = {
-                "is_recording": recorder.is_recording if recorder else False,
-                "is_running": recorder.is_running if recorder else False,
-                "is_shut_down": recorder is None and not is_initializing,
-                "is_initializing": is_initializing,
-            }
-            await websocket.send_json(
-                {"status": status, "type": "status", "time": time.time()}
-            )
-            await asyncio.sleep(1)
+        status_clients.add(websocket)
+        # Late joiners get the current state instead of waiting for a change
+        if status_payload is not None:
+            await websocket.send_text(status_payload)
+        await wait_for_disconnect(websocket)
     except WebSocketDisconnect:
         logger.info("Status WebSocket disconnected")
     except Exception as e:
         logger.error(f"Status error: {e}")
+    finally:
+        status_clients.discard(websocket)
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=8000,
+        loop="auto",
+        http="httptools",
+        ws="auto",
+        # Frames are short JSON strings; deflating them costs more than it saves
+        ws_per_message_deflate=False,
+    )